@@ -17,6 +17,9 @@ PYBIND11_MODULE(arm_llm_runtime, m) {
         .value("Q4_K", QuantizationType::Q4_K)
         .value("Q8_0", QuantizationType::Q8_0)
         .value("Q8_K", QuantizationType::Q8_K)
+        .value("Q4_0_4_4", QuantizationType::Q4_0_4_4)
+        .value("Q4_0_4_8", QuantizationType::Q4_0_4_8)
+        .value("Q4_0_8_8", QuantizationType::Q4_0_8_8)
         .value("CUSTOM", QuantizationType::CUSTOM);
     
     py::enum_<ModelType>(m, "ModelType")
@@ -53,6 +56,7 @@ PYBIND11_MODULE(arm_llm_runtime, m) {
         .def_readwrite("use_neon", &RuntimeConfig::use_neon)
         .def_readwrite("use_flash_attention", &RuntimeConfig::use_flash_attention)
         .def_readwrite("enable_speculative_decoding", &RuntimeConfig::enable_speculative_decoding)
+        .def_readwrite("preferred_kernel", &RuntimeConfig::preferred_kernel)
         .def_readwrite("cache_dir", &RuntimeConfig::cache_dir)
         .def_readwrite("max_cache_size", &RuntimeConfig::max_cache_size)
         .def_readwrite("max_batch_size", &RuntimeConfig::max_batch_size)
@@ -69,8 +73,11 @@ PYBIND11_MODULE(arm_llm_runtime, m) {
         .def_readwrite("top_p", &GenerationConfig::top_p)
         .def_readwrite("repetition_penalty", &GenerationConfig::repetition_penalty)
         .def_readwrite("stop_sequences", &GenerationConfig::stop_sequences)
+        .def_readwrite("stop_token_ids", &GenerationConfig::stop_token_ids)
         .def_readwrite("stream", &GenerationConfig::stream)
-        .def_readwrite("seed", &GenerationConfig::seed);
+        .def_readwrite("seed", &GenerationConfig::seed)
+        .def_readwrite("kv_cache_dtype", &GenerationConfig::kv_cache_dtype)
+        .def_readwrite("kv_cache_symmetric", &GenerationConfig::kv_cache_symmetric);
     
     py::class_<ModelInfo>(m, "ModelInfo")
         .def(py::init<>())
@@ -147,14 +154,38 @@ PYBIND11_MODULE(arm_llm_runtime, m) {
              "Generate text from multiple prompts",
              py::arg("prompts"), py::arg("config") = GenerationConfig{})
         .def("generate_stream", [](Model& self, const std::string& prompt, py::function callback, const GenerationConfig& config) {
-            self.generateStream(prompt, [callback](const std::string& token) {
+            // Built with the GIL held and capturing by reference, so copying or destroying
+            // the wrapper never touches the py::function refcount while the GIL is released
+            std::function<void(const std::string&)> on_token = [&callback](const std::string& token) {
+                py::gil_scoped_acquire acquire;
                 callback(token);
-            }, config);
+            };
+            
+            // Run generation without the GIL so Python consumers can drain tokens concurrently;
+            // released last-declared, so the GIL is back before on_token/callback are destroyed
+            py::gil_scoped_release release;
+            self.generateStream(prompt, on_token, config);
         }, "Generate text with streaming output",
            py::arg("prompt"), py::arg("callback"), py::arg("config") = GenerationConfig{})
+        .def("create_session", &Model::createSession,
+             "Create a chat session that reuses the KV cache between turns")
+        .def("release_kv_cache", &Model::releaseKVCache)
+        .def("prefault_weights", &Model::prefaultWeights)
         .def("info", &Model::info, py::return_value_policy::reference_internal)
         .def("tokenize", &Model::tokenize)
-        .def("detokenize", &Model::detokenize);
+        .def("detokenize", &Model::detokenize)
+        .def("tokenize_stops", &Model::tokenizeStops,
+             "Pre-tokenize stop sequences for GenerationConfig.stop_token_ids",
+             py::arg("stops"));
+    
+    // Chat session class
+    py::class_<ChatSession, std::shared_ptr<ChatSession>>(m, "ChatSession")
+        .def(py::init<std::shared_ptr<Model>>(), py::arg("model"))
+        .def("append_and_generate", &ChatSession::appendAndGenerate,
+             "Append text to the conversation and generate, prefilling only the new tokens",
+             py::arg("text"), py::arg("config") = GenerationConfig{})
+        .def("reset", &ChatSession::reset)
+        .def("context_length", &ChatSession::context_length);
     
     // Main runtime class
     py::class_<ArmLLMRuntime>(m, "ArmLLMRuntime")
@@ -167,6 +198,11 @@ PYBIND11_MODULE(arm_llm_runtime, m) {
              py::arg("model_path"), py::arg("quantization") = QuantizationType::Q4_K)
         .def("unload_model", &ArmLLMRuntime::unloadModel)
         .def("unload_all_models", &ArmLLMRuntime::unloadAllModels)
+        .def("get_model_info", &ArmLLMRuntime::getModelInfo,
+             "Read model dimensions from its config without loading weights",
+             py::arg("model_id"))
+        .def("release_unused_kv", &ArmLLMRuntime::releaseUnusedKV,
+             "Free KV cache blocks of loaded models between workloads")
         .def("quantize_model", &ArmLLMRuntime::quantizeModel,
              "Quantize a model",
              py::arg("input_path"), py::arg("output_path"), py::arg("config"))
@@ -181,6 +217,14 @@ PYBIND11_MODULE(arm_llm_runtime, m) {
     py::module utils = m.def_submodule("utils", "Utility functions");
     utils.def("get_system_info", &utils::get_system_info);
     utils.def("has_neon_support", &utils::has_neon_support);
+    utils.def("has_dotprod", &utils::has_dotprod);
+    utils.def("has_i8mm", &utils::has_i8mm);
+    utils.def("has_sve", &utils::has_sve);
+    utils.def("sve_vector_length", &utils::sve_vector_length,
+              "SVE vector length in bytes, 0 without SVE");
+    utils.def("has_sme", &utils::has_sme);
+    utils.def("performance_core_ids", &utils::performance_core_ids);
+    utils.def("num_performance_cores", &utils::num_performance_cores);
     utils.def("get_available_memory", &utils::get_available_memory);
     utils.def("format_bytes", &utils::format_bytes);
     utils.def("get_time_ms", &utils::get_time_ms);
@@ -194,12 +238,20 @@ PYBIND11_MODULE(arm_llm_runtime, m) {
         else if (quantize == "Q4_K") q_type = QuantizationType::Q4_K;
         else if (quantize == "Q8_0") q_type = QuantizationType::Q8_0;
         else if (quantize == "Q8_K") q_type = QuantizationType::Q8_K;
+        else if (quantize == "Q4_0_4_4") q_type = QuantizationType::Q4_0_4_4;
+        else if (quantize == "Q4_0_4_8") q_type = QuantizationType::Q4_0_4_8;
+        else if (quantize == "Q4_0_8_8") q_type = QuantizationType::Q4_0_8_8;
         else if (quantize == "NONE") q_type = QuantizationType::NONE;
         
         return runtime.loadModel(model_id, q_type);
     }, "Load a model with default runtime configuration",
        py::arg("model_id"), py::arg("quantize") = "Q4_K");
     
+    m.def("peek_model_info", [](const std::string& model_id, const std::string& cache_dir) {
+        return HuggingFaceClient(cache_dir).getModelInfo(model_id);
+    }, "Read model dimensions from its config before a runtime exists",
+       py::arg("model_id"), py::arg("cache_dir") = "./models");
+    
     m.def("generate", [](const std::string& model_id, const std::string& prompt, 
                         int max_tokens = 100, float temperature = 0.7f, const std::string& quantize = "Q4_K") {
         static ArmLLMRuntime runtime;
@@ -209,6 +261,9 @@ PYBIND11_MODULE(arm_llm_runtime, m) {
         else if (quantize == "Q4_K") q_type = QuantizationType::Q4_K;
         else if (quantize == "Q8_0") q_type = QuantizationType::Q8_0;
         else if (quantize == "Q8_K") q_type = QuantizationType::Q8_K;
+        else if (quantize == "Q4_0_4_4") q_type = QuantizationType::Q4_0_4_4;
+        else if (quantize == "Q4_0_4_8") q_type = QuantizationType::Q4_0_4_8;
+        else if (quantize == "Q4_0_8_8") q_type = QuantizationType::Q4_0_8_8;
         else if (quantize == "NONE") q_type = QuantizationType::NONE;
         
         auto model = runtime.loadModel(model_id, q_type);
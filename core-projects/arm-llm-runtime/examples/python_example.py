@@ -5,10 +5,45 @@ ARM LLM Runtime Python Example
 This example demonstrates how to use the ARM LLM Runtime for various LLM inference tasks.
 """
 
+import functools
+import gc
+import mmap
+import os
+import queue
 import sys
 import time
 import threading
-from typing import List, Optional
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_MODEL = "microsoft/DialoGPT-medium"
+CHAT_MODEL = "meta-llama/Llama-2-7b-chat-hf"
+DEFAULT_CONTEXT_LENGTH = 1024  # used when a model config omits it
+
+EXAMPLE_NAMES = [
+    "Basic Generation",
+    "Advanced Generation",
+    "Streaming Generation",
+    "Batch Generation",
+    "Model Comparison",
+    "Performance Monitoring",
+    "Quantization Config",
+]
+
+def print_usage():
+    """Print usage; needs no native extension"""
+    print("Available examples:")
+    for i, name in enumerate(EXAMPLE_NAMES):
+        print(f"  {i+1}. {name}")
+    print("\nUsage:")
+    print(f"  {sys.argv[0]}           # Run all examples")
+    print(f"  {sys.argv[0]} interactive # Run interactive chat")
+    print(f"  {sys.argv[0]} <number>    # Run specific example")
+
+# Answer 'help' before loading the C++ extension (dlopen + kernel registration)
+if __name__ == "__main__" and sys.argv[1:2] == ["help"]:
+    print_usage()
+    sys.exit(0)
 
 try:
     import arm_llm_runtime as llm
@@ -16,14 +51,109 @@ except ImportError:
     print("Error: arm_llm_runtime module not found. Please build and install the Python bindings.")
     sys.exit(1)
 
-def basic_generation_example():
+def select_quantization():
+    """Pick the fastest repacked Q4_0 layout the host CPU supports"""
+    if llm.utils.has_neon_support():
+        if llm.utils.has_i8mm():
+            if llm.utils.sve_vector_length() == 32:
+                return llm.QuantizationType.Q4_0_8_8  # 256-bit SVE + smmla
+            return llm.QuantizationType.Q4_0_4_8  # smmla GEMM
+        if llm.utils.has_dotprod():
+            return llm.QuantizationType.Q4_0_4_4  # sdot GEMV
+    return llm.QuantizationType.Q4_K
+
+BEST_QUANT = select_quantization()
+
+# Read once so /proc isn't touched next to throughput measurements
+SYSTEM_INFO = llm.utils.get_system_info()
+
+# memory_used values repeat across runs
+format_bytes = functools.lru_cache(maxsize=128)(llm.utils.format_bytes)
+
+COMPARISON_MODELS = [
+    (DEFAULT_MODEL, BEST_QUANT),
+    (DEFAULT_MODEL, llm.QuantizationType.Q8_0),
+]
+
+# Approximate storage cost per weight, including block scales
+BITS_PER_WEIGHT = {
+    llm.QuantizationType.NONE: 16.0,
+    llm.QuantizationType.Q4_0: 4.5,
+    llm.QuantizationType.Q4_K: 4.5,
+    llm.QuantizationType.Q8_0: 8.5,
+    llm.QuantizationType.Q8_K: 8.5,
+    llm.QuantizationType.Q4_0_4_4: 4.5,
+    llm.QuantizationType.Q4_0_4_8: 4.5,
+    llm.QuantizationType.Q4_0_8_8: 4.5,
+}
+
+# Requested KV precision. The runtime does not honour kv_cache_dtype yet (KV stays
+# FP16); once int8 KV kernels land this halves the KV bytes read per decoded token.
+KV_CACHE_DTYPE = llm.DataType.INT8
+
+MAX_TOKENS = 150     # largest gen_config.max_tokens used by the examples
+MAX_CONCURRENT = 5   # largest batch submitted by the examples
+POOL_SLACK = 256 * 1024 * 1024  # activations and scratch buffers
+FALLBACK_MODEL_RESERVATION = 4 * 1024 * 1024 * 1024  # header missing or without dimensions
+MODEL_CACHE_DIR = "./models"
+
+def load_metadata(model_id):
+    """Model header (config.json); the runtime caches it per model and cache dir"""
+    return llm.peek_model_info(model_id, MODEL_CACHE_DIR)
+
+def estimate_pool_size(models, max_tokens=MAX_TOKENS, max_concurrent=MAX_CONCURRENT):
+    """Size the memory pool from model headers instead of a flat reservation"""
+    total = POOL_SLACK
+    for model_id, quantization in models:
+        try:
+            info = load_metadata(model_id)
+        except Exception as e:
+            print(f"Warning: no header for {model_id} ({e}), reserving {format_bytes(FALLBACK_MODEL_RESERVATION)}")
+            total += FALLBACK_MODEL_RESERVATION
+            continue
+        if not (info.num_layers and info.hidden_size and info.vocab_size):
+            total += FALLBACK_MODEL_RESERVATION
+            continue
+        params = 12 * info.num_layers * info.hidden_size ** 2 + info.vocab_size * info.hidden_size
+        weights_bytes = int(params * BITS_PER_WEIGHT.get(quantization, 16.0) / 8)
+        # Not every example uses KV_CACHE_DTYPE, so reserve for FP16
+        kv_bytes_per_token = 2 * info.num_layers * info.hidden_size * 2  # K and V in FP16
+        total += weights_bytes + kv_bytes_per_token * max_tokens * max_concurrent
+    
+    # Round up to a whole page
+    return -(-total // mmap.PAGESIZE) * mmap.PAGESIZE
+
+def create_runtime(models):
+    """Create the runtime shared by all examples"""
+    config = llm.RuntimeConfig()
+    config.memory_pool_size = estimate_pool_size(models)
+    
+    # Keep the worker pool off the LITTLE cores, within whatever mask we were given
+    if hasattr(os, "sched_getaffinity"):
+        allowed = os.sched_getaffinity(0)
+        cpus = (set(llm.utils.performance_core_ids()) & allowed) or allowed
+        if cpus != allowed:
+            # Threads spawned at load inherit the mask
+            os.sched_setaffinity(0, cpus)
+        config.num_threads = len(cpus)
+    else:
+        config.num_threads = llm.utils.num_performance_cores()
+    
+    if llm.utils.has_i8mm():
+        # Hint for the smmla GEMM kernel; the runtime does not act on it yet
+        config.preferred_kernel = "mmla"
+    config.cache_dir = MODEL_CACHE_DIR
+    print(f"Memory pool: {format_bytes(config.memory_pool_size)}")
+    print(f"Threads: {config.num_threads}")
+    if config.preferred_kernel != "auto":
+        print(f"Requested kernel (not yet honoured): {config.preferred_kernel}")
+    
+    return llm.ArmLLMRuntime(config)
+
+def basic_generation_example(runtime, model):
     """Basic text generation example"""
     print("=== Basic Generation Example ===")
     
-    # Load a model with default settings
-    print("Loading DialoGPT-medium model...")
-    model = llm.load_model("microsoft/DialoGPT-medium", quantize="Q4_K")
-    
     # Generate response to a simple prompt
     prompt = "Hello, how are you today?"
     print(f"Prompt: {prompt}")
@@ -34,22 +164,10 @@ def basic_generation_example():
           f"({response.tokens_per_second:.1f} tokens/s)")
     print()
 
-def advanced_generation_example():
+def advanced_generation_example(runtime, model):
     """Advanced generation with custom configuration"""
     print("=== Advanced Generation Example ===")
     
-    # Create runtime with custom configuration
-    config = llm.RuntimeConfig()
-    config.memory_pool_size = 4 * 1024 * 1024 * 1024  # 4GB
-    config.num_threads = 4
-    config.cache_dir = "./models"
-    
-    runtime = llm.ArmLLMRuntime(config)
-    
-    # Load model with specific quantization
-    print("Loading Llama-2-7b-chat model with Q4_K quantization...")
-    model = runtime.load_model("meta-llama/Llama-2-7b-chat-hf", llm.QuantizationType.Q4_K)
-    
     # Configure generation parameters
     gen_config = llm.GenerationConfig()
     gen_config.max_tokens = 150
@@ -57,7 +175,10 @@ def advanced_generation_example():
     gen_config.top_k = 40
     gen_config.top_p = 0.9
     gen_config.repetition_penalty = 1.1
+    gen_config.kv_cache_dtype = KV_CACHE_DTYPE
     gen_config.stop_sequences = ["Human:", "Assistant:"]
+    # Tokenized once; the decode loop compares token ids and only scans newly decoded text
+    gen_config.stop_token_ids = model.tokenize_stops(gen_config.stop_sequences)
     
     # Generate with custom configuration
     prompt = "Explain the concept of artificial intelligence in simple terms."
@@ -66,34 +187,55 @@ def advanced_generation_example():
     result = model.generate(prompt, gen_config)
     print(f"Response: {result.text}")
     print(f"Performance: {result.tokens_per_second:.1f} tokens/s, "
-          f"Memory used: {llm.utils.format_bytes(result.memory_used)}")
+          f"Memory used: {format_bytes(result.memory_used)}")
     print()
 
-def streaming_generation_example():
+def streaming_generation_example(runtime, model):
     """Streaming generation example"""
     print("=== Streaming Generation Example ===")
     
-    model = llm.load_model("microsoft/DialoGPT-medium")
-    
     print("Generating story with streaming output...")
     print("Output: ", end="", flush=True)
     
+    tokens = queue.SimpleQueue()
+    
+    def writer():
+        # Write whatever has accumulated with a single flush; None ends the stream
+        while True:
+            pending = [tokens.get()]
+            try:
+                while True:
+                    pending.append(tokens.get_nowait())
+            except queue.Empty:
+                pass
+            done = pending[-1] is None
+            if done:
+                pending.pop()
+            sys.stdout.write("".join(pending))
+            sys.stdout.flush()
+            if done:
+                return
+    
     def on_token(token: str):
-        print(token, end="", flush=True)
+        tokens.put_nowait(token)
     
     gen_config = llm.GenerationConfig()
     gen_config.max_tokens = 100
     gen_config.temperature = 0.9
     
-    model.generate_stream("Tell me a short story about a robot", on_token, gen_config)
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    writer_thread.start()
+    try:
+        model.generate_stream("Tell me a short story about a robot", on_token, gen_config)
+    finally:
+        tokens.put(None)
+        writer_thread.join()
     print("\n")
 
-def batch_generation_example():
+def batch_generation_example(runtime, model):
     """Batch generation example"""
     print("=== Batch Generation Example ===")
     
-    model = llm.load_model("microsoft/DialoGPT-medium")
-    
     prompts = [
         "What is machine learning?",
         "How do neural networks work?",
@@ -105,30 +247,25 @@ def batch_generation_example():
     gen_config = llm.GenerationConfig()
     gen_config.max_tokens = 80
     
-    start_time = time.time()
+    start_time = time.perf_counter_ns()
     results = model.generate_batch(prompts, gen_config)
-    end_time = time.time()
+    total_time = (time.perf_counter_ns() - start_time) / 1e9
     
-    for i, (prompt, result) in enumerate(zip(prompts, results)):
-        print(f"\nPrompt {i+1}: {prompt}")
+    total_tokens = 0
+    for i, result in enumerate(results):
+        total_tokens += result.tokens_generated
+        print(f"\nPrompt {i+1}: {prompts[i]}")
         print(f"Response: {result.text}")
     
-    total_tokens = sum(r.tokens_generated for r in results)
-    total_time = end_time - start_time
     print(f"\nBatch performance: {total_tokens} tokens in {total_time:.2f}s "
           f"({total_tokens/total_time:.1f} tokens/s)")
     print()
 
-def model_comparison_example():
+def model_comparison_example(runtime, model):
     """Compare different models and quantization levels"""
     print("=== Model Comparison Example ===")
     
-    runtime = llm.ArmLLMRuntime()
-    
-    models_to_test = [
-        ("microsoft/DialoGPT-medium", llm.QuantizationType.Q4_K),
-        ("microsoft/DialoGPT-medium", llm.QuantizationType.Q8_0),
-    ]
+    models_to_test = COMPARISON_MODELS
     
     prompt = "What is the meaning of life?"
     
@@ -136,11 +273,10 @@ def model_comparison_example():
         print(f"\nTesting {model_id} with {quantization}...")
         
         # Load model
-        load_start = time.time()
+        load_start = time.perf_counter_ns()
         model = runtime.load_model(model_id, quantization)
-        load_time = time.time() - load_start
+        load_time = (time.perf_counter_ns() - load_start) / 1e9
         
-        # Get model info
         info = model.info()
         print(f"Model info: {info.vocab_size} vocab, {info.num_layers} layers")
         print(f"Load time: {load_time:.2f}s")
@@ -149,31 +285,35 @@ def model_comparison_example():
         result = model.generate(prompt)
         print(f"Response: {result.text[:100]}...")
         print(f"Speed: {result.tokens_per_second:.1f} tokens/s")
-        print(f"Memory: {llm.utils.format_bytes(result.memory_used)}")
+        print(f"Memory: {format_bytes(result.memory_used)}")
 
-def interactive_chat_example():
+def interactive_chat_example(runtime, model):
     """Interactive chat example"""
     print("=== Interactive Chat Example ===")
     print("Starting interactive chat session...")
     print("Type 'quit' to exit, 'help' for commands")
     
-    model = llm.load_model("microsoft/DialoGPT-medium")
-    
     gen_config = llm.GenerationConfig()
     gen_config.max_tokens = 100
     gen_config.temperature = 0.7
     
-    conversation_history = []
+    # The session keeps earlier turns in the KV cache between calls
+    session = model.create_session()
+    context_limit = model.info().context_length or DEFAULT_CONTEXT_LENGTH
+    
+    # Only the last 5 entries are ever used as context
+    conversation_history = deque(maxlen=5)
     
     while True:
         try:
             user_input = input("\nYou: ").strip()
+            cmd = user_input.lower()
             
-            if user_input.lower() in ['quit', 'exit', 'bye']:
+            if cmd in ('quit', 'exit', 'bye'):
                 print("Goodbye!")
                 break
             
-            if user_input.lower() == 'help':
+            if cmd == 'help':
                 print("Commands:")
                 print("  quit/exit/bye - Exit chat")
                 print("  help         - Show this help")
@@ -181,12 +321,13 @@ def interactive_chat_example():
                 print("  info         - Show model information")
                 continue
             
-            if user_input.lower() == 'clear':
+            if cmd == 'clear':
                 conversation_history.clear()
+                session.reset()
                 print("Conversation history cleared.")
                 continue
             
-            if user_input.lower() == 'info':
+            if cmd == 'info':
                 info = model.info()
                 print(f"Model: {info.name}")
                 print(f"Type: {info.type}")
@@ -199,15 +340,21 @@ def interactive_chat_example():
             # Add user input to conversation
             conversation_history.append(f"Human: {user_input}")
             
-            # Create prompt with conversation context
-            context = "\n".join(conversation_history[-5:])  # Keep last 5 exchanges
-            prompt = context + "\nAssistant:"
+            # Only the new turn needs prefill
+            prompt = f"\nHuman: {user_input}\nAssistant:"
+            needed = len(model.tokenize(prompt)) + gen_config.max_tokens
+            
+            if session.context_length() + needed > context_limit:
+                # Context window full: restart the session from the last 5 exchanges
+                session.reset()
+                context = "\n".join(conversation_history)
+                prompt = context + "\nAssistant:"
             
             # Generate response
-            result = model.generate(prompt, gen_config)
+            result = session.append_and_generate(prompt, gen_config)
             
             # Extract just the assistant's response
-            response = result.text.split("Assistant:")[-1].strip()
+            response = result.text.rpartition("Assistant:")[2].strip()
             conversation_history.append(f"Assistant: {response}")
             
             print(f"Assistant: {response}")
@@ -218,12 +365,15 @@ def interactive_chat_example():
         except Exception as e:
             print(f"Error: {e}")
 
-def performance_monitoring_example():
+def performance_monitoring_example(runtime, model):
     """Performance monitoring example"""
     print("=== Performance Monitoring Example ===")
     
-    runtime = llm.ArmLLMRuntime()
-    model = runtime.load_model("microsoft/DialoGPT-medium")
+    # Warm up so weight page faults and allocator first-touch stay out of the metrics
+    model.prefault_weights()
+    warmup_config = llm.GenerationConfig()
+    warmup_config.max_tokens = 8
+    model.generate("warmup", warmup_config)
     
     # Reset metrics
     runtime.reset_metrics()
@@ -237,38 +387,42 @@ def performance_monitoring_example():
         "How can AI help in healthcare?"
     ]
     
+    gen_config = llm.GenerationConfig()
+    gen_config.kv_cache_dtype = KV_CACHE_DTYPE
+    
     print("Generating multiple responses to collect metrics...")
-    for prompt in prompts:
-        result = model.generate(prompt)
+    start_time = time.perf_counter_ns()
+    results = model.generate_batch(prompts, gen_config)
+    wall_time = (time.perf_counter_ns() - start_time) / 1e9
+    for result in results:
         print(f"Generated {result.tokens_generated} tokens")
     
     # Get performance metrics
     metrics = runtime.get_metrics()
     
     print(f"\nPerformance Metrics:")
+    print(f"Wall time: {wall_time:.2f}s")
     print(f"Total inference time: {metrics.total_inference_time:.2f}s")
     print(f"Average tokens/sec: {metrics.avg_tokens_per_second:.1f}")
     print(f"Total tokens generated: {metrics.total_tokens_generated}")
-    print(f"Memory used: {llm.utils.format_bytes(metrics.memory_used)}")
+    print(f"Memory used: {format_bytes(metrics.memory_used)}")
     print(f"Cache hits: {metrics.cache_hits}")
     print(f"Cache misses: {metrics.cache_misses}")
     
     # System information
     print(f"\nSystem Information:")
-    print(llm.utils.get_system_info())
+    print(SYSTEM_INFO)
     print()
 
-def quantization_example():
+def quantization_example(runtime, model):
     """Model quantization example"""
     print("=== Model Quantization Example ===")
     
-    runtime = llm.ArmLLMRuntime()
-    
     # Example of quantizing a model (in practice, you'd have the original model file)
     print("Example quantization configuration:")
     
     quant_config = llm.QuantizationConfig()
-    quant_config.method = llm.QuantizationType.Q4_K
+    quant_config.method = BEST_QUANT
     quant_config.bits = 4
     quant_config.group_size = 128
     quant_config.symmetric = False
@@ -289,54 +443,75 @@ def main():
     
     # Check system info
     print("System Information:")
-    print(llm.utils.get_system_info())
+    print(SYSTEM_INFO)
     print(f"NEON support: {llm.utils.has_neon_support()}")
+    print(f"Default quantization: {BEST_QUANT}")
     print()
     
-    examples = [
-        ("Basic Generation", basic_generation_example),
-        ("Advanced Generation", advanced_generation_example),
-        ("Streaming Generation", streaming_generation_example),
-        ("Batch Generation", batch_generation_example),
-        ("Model Comparison", model_comparison_example),
-        ("Performance Monitoring", performance_monitoring_example),
-        ("Quantization Config", quantization_example),
+    example_funcs = [
+        (basic_generation_example, DEFAULT_MODEL),
+        (advanced_generation_example, CHAT_MODEL),
+        (streaming_generation_example, DEFAULT_MODEL),
+        (batch_generation_example, DEFAULT_MODEL),
+        (model_comparison_example, DEFAULT_MODEL),
+        (performance_monitoring_example, DEFAULT_MODEL),
+        (quantization_example, None),
     ]
+    examples = [(name, func, model_id)
+                for name, (func, model_id) in zip(EXAMPLE_NAMES, example_funcs)]
+    selected = examples
     
     if len(sys.argv) > 1:
         if sys.argv[1] == "interactive":
-            interactive_chat_example()
-            return
+            selected = [("Interactive Chat", interactive_chat_example, DEFAULT_MODEL)]
         elif sys.argv[1] == "help":
-            print("Available examples:")
-            for i, (name, _) in enumerate(examples):
-                print(f"  {i+1}. {name}")
-            print("\nUsage:")
-            print(f"  {sys.argv[0]}           # Run all examples")
-            print(f"  {sys.argv[0]} interactive # Run interactive chat")
-            print(f"  {sys.argv[0]} <number>    # Run specific example")
+            print_usage()
             return
         else:
             try:
                 example_num = int(sys.argv[1]) - 1
-                if 0 <= example_num < len(examples):
-                    name, func = examples[example_num]
-                    print(f"Running example: {name}")
-                    func()
-                    return
-                else:
-                    print(f"Invalid example number. Choose 1-{len(examples)}")
-                    return
             except ValueError:
                 print("Invalid argument. Use 'help' for usage.")
                 return
+            if not 0 <= example_num < len(examples):
+                print(f"Invalid example number. Choose 1-{len(examples)}")
+                return
+            selected = [examples[example_num]]
+            print(f"Running example: {selected[0][0]}")
+    
+    # Models the selected examples will load, used to size the memory pool
+    planned = {(model_id, BEST_QUANT) for _, _, model_id in selected if model_id}
+    if any(func is model_comparison_example for _, func, _ in selected):
+        planned.update(COMPARISON_MODELS)
+    
+    # One runtime and one load per (model_id, quantization) for the whole demo
+    runtime = create_runtime(sorted(planned, key=str))
+    model_cache: Dict[Tuple[str, Any], Any] = {}
+    
+    def get_model(model_id: Optional[str], quantization=BEST_QUANT):
+        if model_id is None:
+            return None
+        key = (model_id, quantization)
+        if key not in model_cache:
+            print(f"Loading {model_id} with {quantization}...")
+            model_cache[key] = runtime.load_model(*key)
+        return model_cache[key]
+    
+    if len(selected) == 1:
+        _, func, model_id = selected[0]
+        func(runtime, get_model(model_id))
+        return
     
     # Run all examples
-    for name, func in examples:
+    for name, func, model_id in selected:
         try:
-            func()
+            func(runtime, get_model(model_id))
         except Exception as e:
             print(f"Error in {name}: {e}")
+        finally:
+            # Keep cached weights, but don't carry KV pages into the next example
+            runtime.release_unused_kv()
+            gc.collect()
         print("-" * 40)
 
 if __name__ == "__main__":
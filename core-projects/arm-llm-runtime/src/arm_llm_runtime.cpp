@@ -8,11 +8,20 @@
 #include <filesystem>
 #include <cstring>
 #include <cmath>
+#include <unistd.h>
 
 #ifdef __ARM_NEON
 #include <arm_neon.h>
 #endif
 
+#if defined(__linux__) && defined(__aarch64__)
+#include <sys/auxv.h>
+#include <sys/prctl.h>
+#include <asm/hwcap.h>
+#elif defined(__APPLE__) && defined(__aarch64__)
+#include <sys/sysctl.h>
+#endif
+
 // For HTTP requests
 #include <curl/curl.h>
 // For JSON parsing
@@ -272,6 +281,31 @@ std::string HuggingFaceClient::downloadModel(const std::string& model_id, const
     return model_path;
 }
 
+std::unordered_map<std::string, ModelInfo> HuggingFaceClient::model_cache_;
+std::mutex HuggingFaceClient::model_cache_mutex_;
+
+ModelInfo HuggingFaceClient::getModelInfo(const std::string& model_id) {
+    // Header-only probe: fetch config.json without pulling the weights
+    std::string model_path = cache_dir_ + "/" + model_id;
+    std::string config_path = model_path + "/config.json";
+    
+    std::lock_guard<std::mutex> lock(model_cache_mutex_);
+    auto it = model_cache_.find(config_path);
+    if (it != model_cache_.end()) {
+        return it->second;
+    }
+    
+    if (!std::filesystem::exists(config_path)) {
+        std::filesystem::create_directories(model_path);
+        download_file("https://huggingface.co/" + model_id + "/resolve/main/config.json", config_path);
+    }
+    
+    ModelInfo info = parse_config(config_path);
+    info.name = model_id;
+    model_cache_[config_path] = info;
+    return info;
+}
+
 std::string HuggingFaceClient::download_file(const std::string& url, const std::string& path) {
     CURL* curl = curl_easy_init();
     if (!curl) {
@@ -327,16 +361,22 @@ ModelInfo HuggingFaceClient::parse_config(const std::string& config_path) {
     if (json_object_object_get_ex(root, "vocab_size", &obj)) {
         info.vocab_size = json_object_get_int(obj);
     }
-    if (json_object_object_get_ex(root, "hidden_size", &obj)) {
+    // Llama-style keys first, then the GPT-2 names (n_embd, n_layer, ...)
+    if (json_object_object_get_ex(root, "hidden_size", &obj) ||
+        json_object_object_get_ex(root, "n_embd", &obj)) {
         info.hidden_size = json_object_get_int(obj);
     }
-    if (json_object_object_get_ex(root, "num_hidden_layers", &obj)) {
+    if (json_object_object_get_ex(root, "num_hidden_layers", &obj) ||
+        json_object_object_get_ex(root, "n_layer", &obj)) {
         info.num_layers = json_object_get_int(obj);
     }
-    if (json_object_object_get_ex(root, "num_attention_heads", &obj)) {
+    if (json_object_object_get_ex(root, "num_attention_heads", &obj) ||
+        json_object_object_get_ex(root, "n_head", &obj)) {
         info.num_heads = json_object_get_int(obj);
     }
-    if (json_object_object_get_ex(root, "max_position_embeddings", &obj)) {
+    if (json_object_object_get_ex(root, "max_position_embeddings", &obj) ||
+        json_object_object_get_ex(root, "n_positions", &obj) ||
+        json_object_object_get_ex(root, "n_ctx", &obj)) {
         info.context_length = json_object_get_int(obj);
     }
     
@@ -544,11 +584,10 @@ std::shared_ptr<Model> ArmLLMRuntime::loadModel(const std::string& model_id, Qua
     }
     
     // Download model if not cached
-    std::string model_path = hf_client_->downloadModel(model_id);
+    hf_client_->downloadModel(model_id);
     
-    // Parse model info
-    ModelInfo info = hf_client_->parse_config(model_path + "/config.json");
-    info.name = model_id;
+    // Model info is parsed once per model id and shared across quantizations
+    ModelInfo info = hf_client_->getModelInfo(model_id);
     info.quantization = quantization;
     
     // Create and cache model
@@ -587,6 +626,17 @@ void ArmLLMRuntime::unloadAllModels() {
     model_cache_.clear();
 }
 
+ModelInfo ArmLLMRuntime::getModelInfo(const std::string& model_id) {
+    return hf_client_->getModelInfo(model_id);
+}
+
+void ArmLLMRuntime::releaseUnusedKV() {
+    std::lock_guard<std::mutex> lock(cache_mutex_);
+    for (auto& entry : model_cache_) {
+        entry.second->releaseKVCache();
+    }
+}
+
 // Model implementation (simplified)
 Model::Model(const ModelInfo& info, std::shared_ptr<MemoryManager> memory_manager) 
     : info_(info), memory_manager_(memory_manager) {
@@ -601,12 +651,38 @@ Model::Model(const ModelInfo& info, std::shared_ptr<MemoryManager> memory_manage
 
 Model::~Model() = default;
 
+// True if the token sequence ends with any of the pre-tokenized stop sequences
+static bool ends_with_stop(const std::vector<int>& tokens, const std::vector<std::vector<int>>& stops) {
+    for (const auto& stop : stops) {
+        if (!stop.empty() && stop.size() <= tokens.size() &&
+            std::equal(stop.rbegin(), stop.rend(), tokens.rbegin())) {
+            return true;
+        }
+    }
+    return false;
+}
+
+// True if a stop string occurs in the last `appended` characters of text,
+// including matches that straddle the previous tail
+static bool tail_has_stop(const std::string& text, size_t appended, const std::vector<std::string>& stops) {
+    for (const auto& stop : stops) {
+        size_t window = std::min(text.size(), appended + stop.size());
+        if (!stop.empty() && text.find(stop, text.size() - window) != std::string::npos) {
+            return true;
+        }
+    }
+    return false;
+}
+
 GenerationResult Model::generate(const std::string& prompt, const GenerationConfig& config) {
     auto start_time = std::chrono::high_resolution_clock::now();
     
     // Tokenize input
     auto tokens = tokenize(prompt);
     
+    // This prompt replaces whatever a chat session had cached
+    kv_owner_ = nullptr;
+    
     GenerationResult result;
     result.text = prompt;
     
@@ -621,15 +697,14 @@ GenerationResult Model::generate(const std::string& prompt, const GenerationConf
         std::string token_text = detokenize({next_token});
         result.text += token_text;
         
-        // Check stop sequences
-        for (const auto& stop : config.stop_sequences) {
-            if (result.text.find(stop) != std::string::npos) {
-                goto generation_done;
-            }
+        // Check stop sequences: token ids first, then the decoded tail in case
+        // the stop text was produced by a different token split
+        if (ends_with_stop(tokens, config.stop_token_ids) ||
+            tail_has_stop(result.text, token_text.size(), config.stop_sequences)) {
+            break;
         }
     }
     
-generation_done:
     auto end_time = std::chrono::high_resolution_clock::now();
     auto duration = std::chrono::duration_cast<std::chrono::milliseconds>(end_time - start_time);
     
@@ -660,6 +735,15 @@ std::vector<int> Model::tokenize(const std::string& text) {
     return tokens;
 }
 
+std::vector<std::vector<int>> Model::tokenizeStops(const std::vector<std::string>& stops) {
+    std::vector<std::vector<int>> ids;
+    ids.reserve(stops.size());
+    for (const auto& stop : stops) {
+        ids.push_back(tokenize(stop));
+    }
+    return ids;
+}
+
 std::string Model::detokenize(const std::vector<int>& tokens) {
     // Simplified detokenization
     std::string text;
@@ -685,6 +769,94 @@ std::vector<float> Model::forward(const std::vector<int>& tokens) {
     return logits;
 }
 
+void Model::releaseKVCache() {
+    kv_cache_.keys.clear();
+    kv_cache_.values.clear();
+    kv_cache_.current_length = 0;
+    kv_owner_ = nullptr;
+}
+
+void Model::prefaultWeights() {
+    const size_t page_size = static_cast<size_t>(sysconf(_SC_PAGESIZE));
+    for (const auto& entry : weights_) {
+        const volatile char* ptr = static_cast<const volatile char*>(entry.second.data());
+        if (!ptr) continue;
+        for (size_t offset = 0; offset < entry.second.bytes(); offset += page_size) {
+            (void)ptr[offset];
+        }
+    }
+}
+
+std::shared_ptr<ChatSession> Model::createSession() {
+    return std::make_shared<ChatSession>(shared_from_this());
+}
+
+// ChatSession implementation
+ChatSession::ChatSession(std::shared_ptr<Model> model) : model_(std::move(model)) {}
+
+ChatSession::~ChatSession() {
+    if (model_->kv_owner_ == this) {
+        model_->kv_owner_ = nullptr;
+    }
+}
+
+GenerationResult ChatSession::appendAndGenerate(const std::string& text, const GenerationConfig& config) {
+    auto start_time = std::chrono::high_resolution_clock::now();
+    
+    auto new_tokens = model_->tokenize(text);
+    tokens_.insert(tokens_.end(), new_tokens.begin(), new_tokens.end());
+    
+    GenerationResult result;
+    result.tokens_generated = 0;
+    
+    // The model has one KV cache; if another session, a plain generate() or
+    // releaseKVCache() has used it since our last turn, prefill everything again
+    if (model_->kv_owner_ != this) {
+        cached_tokens_ = 0;
+    }
+    model_->kv_owner_ = this;
+    
+    // Earlier turns are already cached; only prefill what was appended since
+    std::vector<int> pending(tokens_.begin() + cached_tokens_, tokens_.end());
+    
+    for (int i = 0; i < config.max_tokens; ++i) {
+        auto logits = model_->forward(pending);
+        cached_tokens_ = tokens_.size();
+        
+        int next_token = model_->sample_token(logits, config);
+        if (next_token == 0) break; // EOS token
+        
+        tokens_.push_back(next_token);
+        std::string token_text = model_->detokenize({next_token});
+        result.text += token_text;
+        result.tokens_generated++;
+        pending.assign(1, next_token);
+        
+        if (ends_with_stop(tokens_, config.stop_token_ids) ||
+            tail_has_stop(result.text, token_text.size(), config.stop_sequences)) {
+            break;
+        }
+    }
+    
+    auto end_time = std::chrono::high_resolution_clock::now();
+    auto duration = std::chrono::duration_cast<std::chrono::milliseconds>(end_time - start_time);
+    
+    result.generation_time = duration.count() / 1000.0;
+    result.tokens_per_second = result.generation_time > 0
+        ? result.tokens_generated / result.generation_time : 0.0;
+    result.memory_used = model_->memory_manager_->used_size();
+    
+    return result;
+}
+
+void ChatSession::reset() {
+    tokens_.clear();
+    cached_tokens_ = 0;
+    if (model_->kv_owner_ == this) {
+        model_->releaseKVCache();
+    }
+}
+
 int Model::sample_token(const std::vector<float>& logits, const GenerationConfig& config) {
     // Apply temperature scaling
     std::vector<float> scaled_logits(logits.size());
@@ -714,10 +886,150 @@ namespace utils {
 #endif
     }
     
+#if defined(__APPLE__) && defined(__aarch64__)
+    static int sysctl_int(const char* name) {
+        int value = 0;
+        size_t size = sizeof(value);
+        return sysctlbyname(name, &value, &size, nullptr, 0) == 0 ? value : 0;
+    }
+    
+    static bool sysctl_flag(const char* name) {
+        return sysctl_int(name) != 0;
+    }
+#endif
+    
+    // Runtime CPU feature probes (the binary may run on a newer core than it was built for)
+    bool has_dotprod() {
+#if defined(__linux__) && defined(__aarch64__) && defined(HWCAP_ASIMDDP)
+        return (getauxval(AT_HWCAP) & HWCAP_ASIMDDP) != 0;
+#elif defined(__APPLE__) && defined(__aarch64__)
+        return sysctl_flag("hw.optional.arm.FEAT_DotProd");
+#elif defined(__ARM_FEATURE_DOTPROD)
+        return true;
+#else
+        return false;
+#endif
+    }
+    
+    bool has_i8mm() {
+#if defined(__linux__) && defined(__aarch64__) && defined(HWCAP2_I8MM)
+        return (getauxval(AT_HWCAP2) & HWCAP2_I8MM) != 0;
+#elif defined(__APPLE__) && defined(__aarch64__)
+        return sysctl_flag("hw.optional.arm.FEAT_I8MM");
+#elif defined(__ARM_FEATURE_MATMUL_INT8)
+        return true;
+#else
+        return false;
+#endif
+    }
+    
+    bool has_sve() {
+#if defined(__linux__) && defined(__aarch64__) && defined(HWCAP_SVE)
+        return (getauxval(AT_HWCAP) & HWCAP_SVE) != 0;
+#elif defined(__ARM_FEATURE_SVE)
+        return true;
+#else
+        return false;
+#endif
+    }
+    
+    int sve_vector_length() {
+        if (!has_sve()) {
+            return 0;
+        }
+#if defined(__linux__) && defined(__aarch64__) && defined(PR_SVE_GET_VL)
+        int vl = prctl(PR_SVE_GET_VL);
+        return vl < 0 ? 0 : (vl & PR_SVE_VL_LEN_MASK);
+#else
+        return 0;
+#endif
+    }
+    
+    bool has_sme() {
+#if defined(__linux__) && defined(__aarch64__) && defined(HWCAP2_SME)
+        return (getauxval(AT_HWCAP2) & HWCAP2_SME) != 0;
+#elif defined(__APPLE__) && defined(__aarch64__)
+        return sysctl_flag("hw.optional.arm.FEAT_SME");
+#elif defined(__ARM_FEATURE_SME)
+        return true;
+#else
+        return false;
+#endif
+    }
+    
+    // CPUs whose capacity is in the big-core cluster; empty if the kernel
+    // reports no capacities (cores are then treated as uniform)
+#ifdef __linux__
+    // Parse a sysfs CPU list such as "0-3,6,8-11"; CPU ids need not be contiguous
+    static std::vector<int> read_cpu_list(const std::string& path) {
+        std::vector<int> cpus;
+        std::ifstream file(path);
+        std::string range;
+        while (std::getline(file, range, ',')) {
+            int first = 0, last = 0;
+            char dash = 0;
+            std::istringstream parser(range);
+            if (!(parser >> first)) {
+                continue;
+            }
+            last = (parser >> dash >> last && dash == '-') ? last : first;
+            for (int cpu = first; cpu <= last; ++cpu) {
+                cpus.push_back(cpu);
+            }
+        }
+        return cpus;
+    }
+#endif
+    
+    std::vector<int> performance_core_ids() {
+        std::vector<int> ids;
+#ifdef __linux__
+        std::vector<std::pair<int, int>> capacities;
+        int max_capacity = 0;
+        
+        for (int cpu : read_cpu_list("/sys/devices/system/cpu/online")) {
+            std::ifstream file("/sys/devices/system/cpu/cpu" + std::to_string(cpu) + "/cpu_capacity");
+            int capacity = 0;
+            if (!(file >> capacity)) {
+                return ids;
+            }
+            capacities.emplace_back(cpu, capacity);
+            max_capacity = std::max(max_capacity, capacity);
+        }
+        
+        for (const auto& [cpu, capacity] : capacities) {
+            if (capacity * 2 > max_capacity) {
+                ids.push_back(cpu);
+            }
+        }
+#endif
+        return ids;
+    }
+    
+    int num_performance_cores() {
+#if defined(__APPLE__) && defined(__aarch64__)
+        int perf_cores = sysctl_int("hw.perflevel0.physicalcpu");
+        if (perf_cores > 0) {
+            return perf_cores;
+        }
+#endif
+        auto ids = performance_core_ids();
+        return ids.empty() ? static_cast<int>(std::thread::hardware_concurrency())
+                           : static_cast<int>(ids.size());
+    }
+    
     std::string get_system_info() {
         std::ostringstream info;
         info << "ARM LLM Runtime System Information:\n";
         info << "NEON Support: " << (has_neon_support() ? "Yes" : "No") << "\n";
+        info << "DotProd Support: " << (has_dotprod() ? "Yes" : "No") << "\n";
+        info << "I8MM Support: " << (has_i8mm() ? "Yes" : "No") << "\n";
+        info << "SVE Support: " << (has_sve() ? "Yes" : "No");
+        if (has_sve()) {
+            info << " (" << sve_vector_length() * 8 << "-bit)";
+        }
+        info << "\n";
+        info << "SME Support: " << (has_sme() ? "Yes" : "No") << "\n";
         info << "Hardware Threads: " << std::thread::hardware_concurrency() << "\n";
         return info.str();
     }
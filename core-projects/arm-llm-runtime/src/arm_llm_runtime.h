@@ -22,6 +22,7 @@ class HuggingFaceClient;
 class QuantizationEngine;
 class MemoryManager;
 class InferenceEngine;
+class ChatSession;
 
 // Enums and configuration structures
 enum class QuantizationType {
@@ -30,6 +31,9 @@ enum class QuantizationType {
     Q4_K,    // 4-bit quantization with K-quants
     Q8_0,    // 8-bit quantization
     Q8_K,    // 8-bit quantization with K-quants
+    Q4_0_4_4, // Q4_0 repacked 4x4 for NEON dotprod (sdot)
+    Q4_0_4_8, // Q4_0 repacked 4x8 for i8mm (smmla)
+    Q4_0_8_8, // Q4_0 repacked 8x8 for i8mm/SVE (smmla)
     CUSTOM
 };
 
@@ -72,6 +76,7 @@ struct RuntimeConfig {
     bool use_neon = true;
     bool use_flash_attention = true;
     bool enable_speculative_decoding = false;
+    std::string preferred_kernel = "auto"; // "auto", "neon", "dotprod" or "mmla" (i8mm)
     
     // Cache configuration
     std::string cache_dir = "./models";
@@ -92,21 +97,26 @@ struct GenerationConfig {
     float top_p = 0.9f;
     float repetition_penalty = 1.1f;
     std::vector<std::string> stop_sequences;
+    std::vector<std::vector<int>> stop_token_ids; // fast path for stop_sequences, see Model::tokenizeStops
     bool stream = false;
     int seed = -1;
+    
+    // Requested KV cache precision; not read by the runtime yet (KV stays FP16)
+    DataType kv_cache_dtype = DataType::FLOAT16;
+    bool kv_cache_symmetric = true;
 };
 
 struct ModelInfo {
     std::string name;
     std::string path;
-    ModelType type;
-    size_t size_bytes;
-    QuantizationType quantization;
-    int vocab_size;
-    int hidden_size;
-    int num_layers;
-    int num_heads;
-    int context_length;
+    ModelType type = ModelType::LLAMA;
+    size_t size_bytes = 0;
+    QuantizationType quantization = QuantizationType::NONE;
+    int vocab_size = 0;      // 0 when the config does not say
+    int hidden_size = 0;
+    int num_layers = 0;
+    int num_heads = 0;
+    int context_length = 0;
     std::unordered_map<std::string, std::string> metadata;
 };
 
@@ -209,7 +219,10 @@ public:
     
 private:
     std::string cache_dir_;
-    std::unordered_map<std::string, ModelInfo> model_cache_;
+    
+    // Parsed headers keyed by config path, shared by every client in the process
+    static std::unordered_map<std::string, ModelInfo> model_cache_;
+    static std::mutex model_cache_mutex_;
     
     std::string download_file(const std::string& url, const std::string& path);
     ModelInfo parse_config(const std::string& config_path);
@@ -238,8 +251,9 @@ private:
     void dequantize_q8_0(const void* input, float* output, size_t size);
 };
 
-// Main model class
-class Model {
+// Main model class. Not thread-safe: generation calls share one KV cache,
+// so callers must not run them concurrently on the same Model.
+class Model : public std::enable_shared_from_this<Model> {
 public:
     Model(const ModelInfo& info, std::shared_ptr<MemoryManager> memory_manager);
     ~Model();
@@ -257,6 +271,15 @@ public:
                        std::function<void(const std::string&)> callback,
                        const GenerationConfig& config = {});
     
+    // Multi-turn chat with KV cache reuse between turns
+    std::shared_ptr<ChatSession> createSession();
+    
+    // Free KV cache blocks held by this model
+    void releaseKVCache();
+    
+    // Touch every weight page so page faults happen before timing starts
+    void prefaultWeights();
+    
     // Model info
     const ModelInfo& info() const { return info_; }
     
@@ -264,6 +287,11 @@ public:
     std::vector<int> tokenize(const std::string& text);
     std::string detokenize(const std::vector<int>& tokens);
     
+    // Tokenize stop sequences once so the decode loop compares token ids. A stop
+    // only matches by id if the model emits the same split as tokenizing it alone;
+    // stop_sequences stay set and are checked on the newly decoded text as well.
+    std::vector<std::vector<int>> tokenizeStops(const std::vector<std::string>& stops);
+    
 private:
     ModelInfo info_;
     std::shared_ptr<MemoryManager> memory_manager_;
@@ -280,11 +308,36 @@ private:
         int current_length = 0;
     };
     KVCache kv_cache_;
+    const ChatSession* kv_owner_ = nullptr; // session whose prefix is in kv_cache_
     
     void load_weights(const std::string& model_path);
     void load_tokenizer(const std::string& tokenizer_path);
     std::vector<float> forward(const std::vector<int>& tokens);
     int sample_token(const std::vector<float>& logits, const GenerationConfig& config);
+    
+    friend class ChatSession;
+};
+
+// Chat session that keeps the prompt KV state alive across turns so
+// each turn only prefills the newly appended tokens
+class ChatSession {
+public:
+    explicit ChatSession(std::shared_ptr<Model> model);
+    ~ChatSession();
+    
+    // Append text to the conversation and generate a continuation
+    GenerationResult appendAndGenerate(const std::string& text,
+                                       const GenerationConfig& config = {});
+    
+    // Drop the conversation and its KV state
+    void reset();
+    
+    size_t context_length() const { return tokens_.size(); }
+    
+private:
+    std::shared_ptr<Model> model_;
+    std::vector<int> tokens_;
+    size_t cached_tokens_ = 0; // tokens already in the KV cache, valid while we own it
 };
 
 // Inference engine with ARM optimizations
@@ -349,6 +402,12 @@ public:
     void unloadModel(const std::string& model_id);
     void unloadAllModels();
     
+    // Model dimensions from config.json, without downloading the weights
+    ModelInfo getModelInfo(const std::string& model_id);
+    
+    // Free KV cache blocks of all loaded models, keeping their weights
+    void releaseUnusedKV();
+    
     // Model quantization
     bool quantizeModel(const std::string& input_path,
                       const std::string& output_path,
@@ -397,6 +456,13 @@ private:
 namespace utils {
     std::string get_system_info();
     bool has_neon_support();
+    bool has_dotprod();
+    bool has_i8mm();
+    bool has_sve();
+    int sve_vector_length(); // bytes, 0 without SVE
+    bool has_sme();
+    std::vector<int> performance_core_ids();
+    int num_performance_cores();
     size_t get_available_memory();
     std::string format_bytes(size_t bytes);
     double get_time_ms();
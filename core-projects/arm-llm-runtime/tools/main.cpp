@@ -33,7 +33,8 @@ void print_usage(const char* program_name) {
     std::cout << "  -m, --model MODEL_ID          HuggingFace model ID (required)\n";
     std::cout << "  -p, --prompt PROMPT            Input prompt for generation\n";
     std::cout << "  -i, --interactive              Interactive chat mode\n";
-    std::cout << "  -q, --quantize TYPE            Quantization type (Q4_0, Q4_K, Q8_0, Q8_K)\n";
+    std::cout << "  -q, --quantize TYPE            Quantization type (Q4_0, Q4_K, Q8_0, Q8_K,\n";
+    std::cout << "                                 Q4_0_4_4, Q4_0_4_8, Q4_0_8_8)\n";
     std::cout << "  -t, --max-tokens N             Maximum tokens to generate (default: 100)\n";
     std::cout << "  -T, --temperature F            Temperature for sampling (default: 0.7)\n";
     std::cout << "  -k, --top-k N                  Top-k sampling (default: 50)\n";
@@ -81,6 +82,9 @@ QuantizationType parse_quantization(const std::string& type) {
     if (type == "Q4_K") return QuantizationType::Q4_K;
     if (type == "Q8_0") return QuantizationType::Q8_0;
     if (type == "Q8_K") return QuantizationType::Q8_K;
+    if (type == "Q4_0_4_4") return QuantizationType::Q4_0_4_4;
+    if (type == "Q4_0_4_8") return QuantizationType::Q4_0_4_8;
+    if (type == "Q4_0_8_8") return QuantizationType::Q4_0_8_8;
     if (type == "NONE") return QuantizationType::NONE;
     
     std::cerr << "Warning: Unknown quantization type '" << type << "', using Q4_K\n";